@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Precompute embeddings for foods.json offline.
+# Writes ids.json (model + ids) and embeddings.npy (float32, one row per id);
+# rag_run.py bulk-loads them instead of calling Ollama while they are newer
+# than foods.json. With --check-recall, compares the app's retrieve() top-k
+# against an exact float32 scan of the collection instead.
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import requests
+from rag_run import (
+    BRUTE_FORCE_MAX_ITEMS,
+    EMBED_MODEL,
+    HNSW_SEARCH_EF,
+    PRECOMPUTED_IDS_FILE,
+    PRECOMPUTED_EMBEDDINGS_FILE,
+    TOP_K,
+    enrich_text,
+    get_collection,
+    get_embeddings_batch,
+    l2_normalize,
+    load_food_data,
+    load_quantized_index,
+    report_embedding_error,
+    retrieve,
+)
+
+# Held-out questions for the recall check
+SAMPLE_QUESTIONS = [
+    "Which Indian dish uses chickpeas?",
+    "What dessert is made from milk and soaked in syrup?",
+    "What is masala dosa made of?",
+    "What is tandoori chicken?",
+    "Which foods are spicy and vegetarian?",
+    "What Japanese soup has noodles?",
+    "Which Middle Eastern dip is made from chickpeas?",
+    "What fruit is yellow and sour?",
+]
+
+def build():
+    food_data = load_food_data()
+
+    print(f"🧮 Embedding {len(food_data)} documents with {EMBED_MODEL}...")
+    vectors = get_embeddings_batch([enrich_text(item) for item in food_data])
+    embeddings = np.stack([np.asarray(vec, dtype=np.float32) for vec in vectors])
+
+    # Each file is written beside its target and moved into place whole.
+    # ids.json goes last: rag_run.py only pairs the two while it is at
+    # least as new as embeddings.npy, so an interrupted build isn't mixed
+    # with the previous one.
+    tmp_path = f"{PRECOMPUTED_EMBEDDINGS_FILE}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(tmp_path, PRECOMPUTED_EMBEDDINGS_FILE)
+    tmp_path = f"{PRECOMPUTED_IDS_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"model": EMBED_MODEL, "ids": [item["id"] for item in food_data]}, f)
+    os.replace(tmp_path, PRECOMPUTED_IDS_FILE)
+    print(f"✅ Saved {embeddings.shape[0]} x {embeddings.shape[1]} embeddings to {PRECOMPUTED_EMBEDDINGS_FILE}")
+
+def check_recall(k=TOP_K):
+    collection = get_collection()
+    index = load_quantized_index()
+    stored = collection.get(include=["embeddings"])
+    n = len(stored["ids"])
+    if n < k + 1:
+        print(f"📊 Only {n} documents stored; nothing to measure for recall@{k}")
+        return
+    corpus = np.asarray(stored["embeddings"], dtype=np.float32)
+    corpus /= np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+
+    hits = 0
+    for q_emb in get_embeddings_batch(SAMPLE_QUESTIONS):
+        exact = np.argpartition(-(corpus @ l2_normalize(q_emb)), min(k, n - 1))[:k]
+        found, _ = retrieve(q_emb, k)
+        hits += len({stored["ids"][i] for i in exact} & set(found))
+    recall = hits / (k * len(SAMPLE_QUESTIONS))
+
+    if index is not None and len(index.ids) <= BRUTE_FORCE_MAX_ITEMS:
+        path = "uint8 scan + float32 ranking"
+    else:
+        path = f"HNSW, search_ef={HNSW_SEARCH_EF}"
+    print(f"📊 Retrieval recall@{k} ({path}): {recall:.3f} "
+          f"({len(SAMPLE_QUESTIONS)} questions, {n} documents)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute embeddings for rag_run.py")
+    parser.add_argument("--check-recall", action="store_true",
+                        help="measure retrieval recall against an exact scan instead of building")
+    args = parser.parse_args()
+    try:
+        if args.check_recall:
+            check_recall()
+        else:
+            build()
+    except requests.exceptions.RequestException as e:
+        report_embedding_error(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Distance kernels for query-side retrieval.
+# Uses Numba (LLVM auto-vectorized, compiled on first call and cached to
+# __pycache__) when installed, otherwise the equivalent NumPy expressions.
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+PARALLEL_MIN_CANDIDATES = 256  # Below this, prange thread start-up costs more than it saves
+
+if numba is not None:
+    @numba.njit(fastmath=True, cache=True)
+    def _cosine_distances(q_norm, cands):
+        out = np.empty(cands.shape[0], dtype=np.float32)
+        for i in range(cands.shape[0]):
+            dot = np.float32(0.0)
+            yy = np.float32(0.0)
+            for d in range(cands.shape[1]):
+                dot += q_norm[d] * cands[i, d]
+                yy += cands[i, d] * cands[i, d]
+            out[i] = np.float32(1.0) - dot / np.sqrt(yy) if yy > 0 else np.float32(1.0)
+        return out
+
+    @numba.njit(fastmath=True, cache=True)
+    def _quantized_row(q_scaled, q_zero, code, norm):
+        # q . (zero + scale * code) = q . zero + (q * scale) . code, reading 1 byte per dimension
+        dot = q_zero
+        for d in range(code.shape[0]):
+            dot += q_scaled[d] * code[d]
+        return np.float32(1.0) - dot / norm
+
+    @numba.njit(fastmath=True, cache=True)
+    def _quantized_serial(q_scaled, q_zero, codes, norms):
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for i in range(codes.shape[0]):
+            out[i] = _quantized_row(q_scaled, q_zero, codes[i], norms[i])
+        return out
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _quantized_parallel(q_scaled, q_zero, codes, norms):
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for i in numba.prange(codes.shape[0]):
+            out[i] = _quantized_row(q_scaled, q_zero, codes[i], norms[i])
+        return out
+else:
+    def _cosine_distances(q_norm, cands):
+        norms = np.linalg.norm(cands, axis=1)
+        norms[norms == 0] = np.inf
+        return (1.0 - (cands @ q_norm) / norms).astype(np.float32)
+
+    def _quantized_serial(q_scaled, q_zero, codes, norms):
+        # NumPy has no uint8 x float32 matvec, so the fallback upcasts the codes
+        return (1.0 - (codes.astype(np.float32) @ q_scaled + q_zero) / norms).astype(np.float32)
+
+    _quantized_parallel = _quantized_serial
+
+
+def _query_vector(q_emb, n_dims):
+    q = np.ascontiguousarray(q_emb, dtype=np.float32)
+    if q.ndim != 1 or q.shape[0] != n_dims:
+        raise ValueError(f"query has shape {q.shape}, expected ({n_dims},)")
+    norm = np.linalg.norm(q)
+    return q / norm if norm > 0 else q
+
+
+# Cosine distance from q_emb to each float candidate row
+def cosine_distances(q_emb, candidate_embs):
+    cands = np.ascontiguousarray(candidate_embs, dtype=np.float32)
+    if cands.ndim != 2:
+        raise ValueError(f"candidates have shape {cands.shape}, expected (n, dims)")
+    return _cosine_distances(_query_vector(q_emb, cands.shape[1]), cands)
+
+
+# Cosine distance from q_emb to each uint8 code row, where a row dequantizes
+# to zero + scale * code and norms holds the dequantized row norms
+def quantized_cosine_distances(q_emb, codes, scale, zero, norms):
+    if codes.ndim != 2 or codes.dtype != np.uint8:
+        raise ValueError(f"codes must be a 2-D uint8 array, got {codes.dtype} {codes.shape}")
+    q_norm = _query_vector(q_emb, codes.shape[1])
+    q_scaled = np.ascontiguousarray(q_norm * scale, dtype=np.float32)
+    q_zero = np.float32(q_norm @ zero)
+    codes = np.ascontiguousarray(codes)
+    norms = np.ascontiguousarray(np.maximum(norms, 1e-12), dtype=np.float32)
+    if codes.shape[0] >= PARALLEL_MIN_CANDIDATES:
+        return _quantized_parallel(q_scaled, q_zero, codes, norms)
+    return _quantized_serial(q_scaled, q_zero, codes, norms)
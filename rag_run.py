@@ -2,17 +2,26 @@
 import os
 import json
 import sys
+import argparse
+import hashlib
+import sqlite3
+import functools
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import chromadb
+import fast_distance
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
 import threading
 
-# Force UTF-8 output on Windows
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Constants
 CHROMA_DIR = "chroma_db"
@@ -20,58 +29,472 @@ COLLECTION_NAME = "foods"
 JSON_FILE = "foods.json"
 EMBED_MODEL = "mxbai-embed-large"
 LLM_MODEL = "llama3.2"
+LLM_KEEP_ALIVE = "30m"  # Keep the LLM loaded in Ollama between questions
+STREAM_FLUSH_MS = 50  # How often buffered LLM tokens are written to the output
+HNSW_SMALL_COLLECTION = 5000  # Use a sparser HNSW graph below this many items
+TOP_K = 3  # Documents passed to the LLM
+HNSW_SEARCH_EF = 16  # hnswlib needs ef >= n_results (TOP_K)
+BRUTE_FORCE_MAX_ITEMS = 2000  # Up to this many items, scan the uint8 index instead of HNSW
+SCAN_CANDIDATES = 16  # Shortlist from the uint8 scan, ranked on float32 embeddings
+QUANT_MIN_CALIBRATION = 64  # Recalibrate the uint8 index on growth until this many vectors set its range
+QUANT_MAX_CLIP_ERROR = 0.5  # Mean overshoot per value, in uint8 steps, before new vectors force a recalibration
+EMBED_WORKERS = 4  # Concurrent /api/embed requests during ingest
+EMBED_CACHE_DB = "embed_cache.sqlite"
+PRECOMPUTED_IDS_FILE = "ids.json"  # Written by build_embeddings.py
+PRECOMPUTED_EMBEDDINGS_FILE = "embeddings.npy"
+QUANTIZED_INDEX_FILE = os.path.join(CHROMA_DIR, "quantized_index.npz")  # Kept beside the collection it mirrors
+ANSWER_CACHE_FILE = "answer_cache.npz"
+ANSWER_CACHE_THRESHOLD = 0.95  # Cosine similarity to reuse an earlier answer
+ANSWER_CACHE_FLUSH_EVERY = 5
 
 # Load data
-with open(JSON_FILE, "r", encoding="utf-8") as f:
-    food_data = json.load(f)
+@functools.lru_cache(maxsize=None)
+def load_food_data():
+    with open(JSON_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# HNSW index settings, sized for the corpus. Chroma only applies these when
+# the collection is created; delete CHROMA_DIR to rebuild an existing index.
+def hnsw_metadata(n_items):
+    return {
+        "hnsw:space": "cosine",
+        # Small corpora are nearly a linear scan anyway; a sparser graph
+        # means fewer neighbours to visit per node
+        "hnsw:M": 8 if n_items < HNSW_SMALL_COLLECTION else 16,
+        "hnsw:construction_ef": 100,
+        "hnsw:search_ef": HNSW_SEARCH_EF,
+    }
+
+# Setup ChromaDB (opened on first use)
+@functools.lru_cache(maxsize=None)
+def get_collection():
+    chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+    collection = chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata=hnsw_metadata(len(load_food_data()))
+    )
+    config = getattr(collection, "configuration", None)
+    hnsw_config = (config.get("hnsw") or {}) if isinstance(config, dict) else {}
+
+    # Collections created before hnsw_metadata() keep Chroma's default l2 space
+    space = hnsw_config.get("space") or (collection.metadata or {}).get("hnsw:space", "l2")
+    if space != "cosine":
+        print(f"⚠️ Collection '{COLLECTION_NAME}' uses '{space}' distance, but retrieval here ranks by cosine.")
+        print(f"   Delete {CHROMA_DIR}/ and restart to rebuild it with the current index settings.")
+
+    # search_ef is the one HNSW setting Chroma lets existing collections change
+    if hnsw_config.get("ef_search") != HNSW_SEARCH_EF:
+        try:
+            collection.modify(configuration={"hnsw": {"ef_search": HNSW_SEARCH_EF}})
+        except Exception as e:
+            print(f"⚠️ Could not set search_ef={HNSW_SEARCH_EF} on '{COLLECTION_NAME}' ({e}); "
+                  f"keeping the value it was created with")
+    return collection
 
-# Setup ChromaDB
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-collection = chroma_client.get_or_create_collection(name=COLLECTION_NAME)
+# Serializes writes to the collection (ingest runs beside the GUI)
+collection_lock = threading.Lock()
 
-# Ollama embedding function
+# Decode an Ollama JSON body, using orjson when it is installed
+def loads_json(raw):
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+# Shared HTTP session so Ollama calls reuse keep-alive connections. The pool
+# covers the EMBED_WORKERS ingest threads plus the GUI; POSTs are only
+# retried on connection failures (urllib3 doesn't retry them on read errors).
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.1)
+))
+
+# Persistent embedding cache keyed by sha256(model|text) (opened on first use)
+@functools.lru_cache(maxsize=None)
+def get_embed_cache():
+    conn = sqlite3.connect(EMBED_CACHE_DB, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS emb(key TEXT PRIMARY KEY, vec BLOB)")
+    conn.commit()
+    return conn
+
+embed_cache_lock = threading.Lock()
+
+def _embed_cache_key(text):
+    return hashlib.sha256(f"{EMBED_MODEL}|{text}".encode("utf-8")).hexdigest()
+
+def embed_cache_get(text):
+    with embed_cache_lock:
+        row = get_embed_cache().execute("SELECT vec FROM emb WHERE key = ?", (_embed_cache_key(text),)).fetchone()
+    if row is None:
+        return None
+    return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+def embed_cache_put(texts, embeddings):
+    rows = [(_embed_cache_key(text), np.asarray(emb, dtype=np.float32).tobytes())
+            for text, emb in zip(texts, embeddings)]
+    with embed_cache_lock:
+        conn = get_embed_cache()
+        conn.executemany("INSERT OR REPLACE INTO emb(key, vec) VALUES (?, ?)", rows)
+        conn.commit()
+
+def cached_embedding(func):
+    @functools.wraps(func)
+    def wrapper(text):
+        emb = embed_cache_get(text)
+        if emb is None:
+            emb = func(text)
+            embed_cache_put([text], [emb])
+        return emb
+    return wrapper
+
+# Ollama embedding function. Request errors propagate to the caller, which
+# may be a worker thread (see report_embedding_error).
+@cached_embedding
 def get_embedding(text):
-    try:
-        response = requests.post("http://localhost:11434/api/embeddings", json={
-            "model": EMBED_MODEL,
-            "prompt": text
-        }, timeout=30)
+    response = SESSION.post("http://localhost:11434/api/embeddings", json={
+        "model": EMBED_MODEL,
+        "prompt": text
+    }, timeout=30)
+    response.raise_for_status()
+    return loads_json(response.content)["embedding"]
+
+# Embed one batch of texts with a single /api/embed request
+def _embed_batch(batch):
+    response = SESSION.post("http://localhost:11434/api/embed", json={
+        "model": EMBED_MODEL,
+        "input": batch
+    }, timeout=60)
+    if response.status_code == 404:
+        data = {}  # Older Ollama without /api/embed
+    else:
         response.raise_for_status()
-        return response.json()["embedding"]
-    except requests.exceptions.ConnectionError:
+        data = loads_json(response.content)
+
+    if "embeddings" not in data:
+        # Fall back to the legacy single-prompt endpoint (cached per text)
+        return [get_embedding(text) for text in batch]
+    embed_cache_put(batch, data["embeddings"])
+    return data["embeddings"]
+
+# Ollama batch embedding function: uncached texts are split into batches
+# of batch_size and sent concurrently over the shared session
+def get_embeddings_batch(texts, batch_size=32):
+    embeddings = [embed_cache_get(text) for text in texts]
+    misses = [i for i, emb in enumerate(embeddings) if emb is None]
+    batches = [[texts[i] for i in misses[start:start + batch_size]]
+               for start in range(0, len(misses), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        fetched = [emb for batch_embs in executor.map(_embed_batch, batches) for emb in batch_embs]
+    for i, emb in zip(misses, fetched):
+        embeddings[i] = emb
+    return embeddings
+
+# Console message for a failed embedding request during ingest or build
+def report_embedding_error(e):
+    if isinstance(e, requests.exceptions.ConnectionError):
         print("❌ Error: Cannot connect to Ollama at http://localhost:11434")
         print("   Please ensure Ollama is running. Start it with: ollama serve")
-        sys.exit(1)
-    except requests.exceptions.Timeout:
+    elif isinstance(e, requests.exceptions.Timeout):
         print("❌ Error: Request to Ollama timed out")
-        sys.exit(1)
-    except Exception as e:
-        print(f"❌ Error getting embedding: {e}")
-        sys.exit(1)
-
-# Add only new items
-existing_ids = set(collection.get()['ids'])
-new_items = [item for item in food_data if item['id'] not in existing_ids]
-
-if new_items:
-    print(f"🆕 Adding {len(new_items)} new documents to Chroma...")
-    for item in new_items:
-        # Enhance text with region/type
-        enriched_text = item["text"]
-        if "region" in item:
-            enriched_text += f" This food is popular in {item['region']}."
-        if "type" in item:
-            enriched_text += f" It is a type of {item['type']}."
-
-        emb = get_embedding(enriched_text)
-
-        collection.add(
-            documents=[item["text"]],  # Use original text as retrievable context
-            embeddings=[emb],
-            ids=[item["id"]]
-        )
-else:
-    print("✅ All documents already in ChromaDB.")
+    else:
+        print(f"❌ Error getting embeddings: {e}")
+
+# Semantic answer cache: L2-normalized question embeddings -> LLM answers
+def l2_normalize(emb):
+    vec = np.asarray(emb, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+# Write an .npz next to path and move it into place, so a crash mid-write
+# never leaves a truncated file behind
+def save_npz_atomic(path, **arrays):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+class AnswerCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.embs = None
+        self.answers = []
+        self.pending = 0
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    # Answers from another embedding/LLM model are not reusable
+                    if data["models"].tolist() == [EMBED_MODEL, LLM_MODEL]:
+                        self.embs = data["embs"].astype(np.float32)
+                        self.answers = data["answers"].tolist()
+            except Exception as e:
+                print(f"⚠️ Ignoring unreadable answer cache {path}: {e}")
+                self.embs = None
+                self.answers = []
+
+    def lookup(self, q_emb):
+        q_norm = l2_normalize(q_emb)
+        with self.lock:
+            if not self.answers or self.embs.shape[1] != q_norm.shape[0]:
+                return None
+            sims = self.embs @ q_norm
+            best = int(np.argmax(sims))
+            if sims[best] < ANSWER_CACHE_THRESHOLD:
+                return None
+            return self.answers[best], float(sims[best])
+
+    def add(self, q_emb, answer):
+        if not answer:
+            return
+        q_norm = l2_normalize(q_emb)[np.newaxis, :]
+        with self.lock:
+            self.embs = q_norm if self.embs is None else np.vstack([self.embs, q_norm])
+            self.answers.append(answer)
+            self.pending += 1
+            if self.pending >= ANSWER_CACHE_FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        save_npz_atomic(self.path, embs=self.embs, answers=np.array(self.answers),
+                        models=np.array([EMBED_MODEL, LLM_MODEL]))
+        self.pending = 0
+
+@functools.lru_cache(maxsize=None)
+def get_answer_cache():
+    answer_cache = AnswerCache(ANSWER_CACHE_FILE)
+    atexit.register(answer_cache.flush)
+    return answer_cache
+
+# Uint8 copy of the corpus embeddings (per-dimension min/max calibration),
+# 4x smaller than float32. Stored beside the Chroma collection, checked
+# against it on load and extended as items are added; only kept while the
+# collection has at most BRUTE_FORCE_MAX_ITEMS items.
+class QuantizedIndex:
+    def __init__(self, ids, codes, scale, zero, norms, calibrated_on):
+        self.ids = ids
+        self.codes = codes
+        self.scale = scale
+        self.zero = zero
+        self.norms = norms  # Norms of the dequantized vectors, for cosine scoring
+        self.calibrated_on = calibrated_on  # Number of vectors the min/max range came from
+
+    @classmethod
+    def build(cls, ids, embeddings):
+        embs = np.asarray(embeddings, dtype=np.float32)
+        zero = embs.min(axis=0)
+        # Constant dimensions get a tiny step, so later values that differ
+        # show up as clipping instead of being silently rescaled
+        scale = np.maximum((embs.max(axis=0) - zero) / 255, 1e-12).astype(np.float32)
+        index = cls([], np.empty((0, embs.shape[1]), dtype=np.uint8), scale, zero,
+                    np.empty(0, dtype=np.float32), len(embs))
+        return index._appended(ids, embs)
+
+    def extended(self, ids, embeddings):
+        # New vectors reuse the existing calibration, so adding items doesn't
+        # need the whole corpus again. Returns None when that calibration
+        # can't be trusted: it came from too few vectors, or the new ones
+        # would be clipped by more than QUANT_MAX_CLIP_ERROR steps on average.
+        embs = np.asarray(embeddings, dtype=np.float32)
+        if self.calibrated_on < QUANT_MIN_CALIBRATION:
+            return None
+        steps = (embs - self.zero) / self.scale
+        clip_error = np.maximum(steps - 255, 0) + np.maximum(-steps, 0)
+        if clip_error.size and float(clip_error.mean()) > QUANT_MAX_CLIP_ERROR:
+            return None
+        return self._appended(ids, embs)
+
+    def _appended(self, ids, embs):
+        codes = np.rint((embs - self.zero) / self.scale).clip(0, 255).astype(np.uint8)
+        norms = np.linalg.norm(codes * self.scale + self.zero, axis=1).astype(np.float32)
+        return QuantizedIndex(self.ids + list(ids), np.vstack([self.codes, codes]), self.scale,
+                              self.zero, np.concatenate([self.norms, norms]), self.calibrated_on)
+
+    @classmethod
+    def load(cls, collection):
+        if not os.path.exists(QUANTIZED_INDEX_FILE):
+            return None
+        try:
+            with np.load(QUANTIZED_INDEX_FILE) as data:
+                # Files without calibrated_on are recalibrated on the next extension
+                calibrated_on = int(data["calibrated_on"]) if "calibrated_on" in data else 0
+                index = cls(data["ids"].tolist(), data["codes"], data["scale"], data["zero"],
+                            data["norms"], calibrated_on)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable uint8 index {QUANTIZED_INDEX_FILE}: {e}")
+            return None
+        count = collection.count()
+        if len(index.ids) != count:
+            print(f"⚠️ uint8 index has {len(index.ids)} vectors but the collection has {count}; "
+                  f"not using it until the next ingest")
+            return None
+        return index
+
+    def save(self):
+        save_npz_atomic(QUANTIZED_INDEX_FILE, ids=np.array(self.ids), codes=self.codes,
+                        scale=self.scale, zero=self.zero, norms=self.norms,
+                        calibrated_on=np.array(self.calibrated_on))
+
+    # Ids of the k nearest rows by cosine distance, scored on the codes directly
+    def scan(self, q_emb, k):
+        dists = fast_distance.quantized_cosine_distances(q_emb, self.codes, self.scale, self.zero, self.norms)
+        top = np.argpartition(dists, k - 1)[:k] if k < len(dists) else np.arange(len(dists))
+        return [self.ids[i] for i in top[np.argsort(dists[top], kind="stable")]]
+
+# uint8 index, loaded by main() and kept in sync by ingest()
+quantized_index = None
+
+def load_quantized_index():
+    global quantized_index
+    quantized_index = QuantizedIndex.load(get_collection())
+    return quantized_index
+
+# Top-k (ids, docs) for a query embedding. Small corpora are scanned in full
+# on the uint8 codes for a shortlist, which is then ranked on its float32
+# embeddings from Chroma; larger ones use Chroma's HNSW query.
+def retrieve(q_emb, k=TOP_K):
+    index = quantized_index
+    collection = get_collection()
+    if index is not None and len(index.ids) <= BRUTE_FORCE_MAX_ITEMS:
+        shortlist = index.scan(q_emb, max(k, SCAN_CANDIDATES))
+        found = collection.get(ids=shortlist, include=["documents", "embeddings"])
+        if len(found["ids"]) == len(shortlist):
+            dists = fast_distance.cosine_distances(q_emb, found["embeddings"])
+            order = np.argsort(dists, kind="stable")[:k]
+            return [found["ids"][i] for i in order], [found["documents"][i] for i in order]
+
+    results = collection.query(query_embeddings=[q_emb], n_results=k)
+    return results['ids'][0], results['documents'][0]
+
+# Enhance text with region/type before embedding
+def enrich_text(item):
+    parts = [item["text"]]
+    if "region" in item:
+        parts.append(f" This food is popular in {item['region']}.")
+    if "type" in item:
+        parts.append(f" It is a type of {item['type']}.")
+    return "".join(parts)
+
+# Embeddings from build_embeddings.py, if both files are newer than JSON_FILE,
+# come from the same build and were made with EMBED_MODEL. Returns
+# ({id: row}, memory-mapped vectors).
+def load_precomputed_embeddings():
+    if not (os.path.exists(PRECOMPUTED_IDS_FILE) and os.path.exists(PRECOMPUTED_EMBEDDINGS_FILE)):
+        return None
+    ids_mtime = os.path.getmtime(PRECOMPUTED_IDS_FILE)
+    embs_mtime = os.path.getmtime(PRECOMPUTED_EMBEDDINGS_FILE)
+    if min(ids_mtime, embs_mtime) <= os.path.getmtime(JSON_FILE):
+        return None
+    # ids.json is written after embeddings.npy; an older one is from an earlier build
+    if ids_mtime < embs_mtime:
+        return None
+    with open(PRECOMPUTED_IDS_FILE, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("model") != EMBED_MODEL:
+        return None
+    vectors = np.load(PRECOMPUTED_EMBEDDINGS_FILE, mmap_mode="r")
+    if len(vectors) != len(meta["ids"]):
+        return None
+    return {doc_id: row for row, doc_id in enumerate(meta["ids"])}, vectors
+
+# Add only new items from JSON_FILE, then bring the uint8 index in sync
+def ingest():
+    global quantized_index
+    collection = get_collection()
+    food_data = load_food_data()
+
+    # Only look up the IDs we have, not the whole collection
+    candidate_ids = [item["id"] for item in food_data]
+    existing_ids = set(collection.get(ids=candidate_ids, include=[])['ids'])
+    new_items = [item for item in food_data if item['id'] not in existing_ids]
+    added_ids, added_embs = [], []
+
+    if new_items:
+        print(f"🆕 Adding {len(new_items)} new documents to Chroma...")
+        new_docs = [item["text"] for item in new_items]  # Use original text as retrievable context
+        new_ids = [item["id"] for item in new_items]
+
+        precomputed = load_precomputed_embeddings()
+        if precomputed is not None and all(doc_id in precomputed[0] for doc_id in new_ids):
+            print(f"📦 Using precomputed embeddings from {PRECOMPUTED_EMBEDDINGS_FILE}")
+            rows, vectors = precomputed
+            new_embs = vectors[[rows[doc_id] for doc_id in new_ids]]
+        else:
+            try:
+                new_embs = get_embeddings_batch([enrich_text(item) for item in new_items])
+            except Exception as e:
+                # Runs in a background thread: report and leave the collection as it is
+                report_embedding_error(e)
+                return
+
+        # One bulk add; fall back to per-item adds so a single bad row
+        # doesn't drop the whole batch
+        with collection_lock:
+            try:
+                collection.add(documents=new_docs, embeddings=new_embs, ids=new_ids)
+                added_ids, added_embs = new_ids, new_embs
+            except Exception as e:
+                print(f"⚠️ Bulk add failed ({e}), adding documents one by one...")
+                for doc, emb, doc_id in zip(new_docs, new_embs, new_ids):
+                    try:
+                        collection.add(documents=[doc], embeddings=[emb], ids=[doc_id])
+                        added_ids.append(doc_id)
+                        added_embs.append(emb)
+                    except Exception as item_error:
+                        print(f"❌ Skipping document {doc_id}: {item_error}")
+    else:
+        print("✅ All documents already in ChromaDB.")
+
+    # Bring the uint8 index in sync: append what was just added, and only
+    # read the whole collection back when there is no usable index yet or
+    # the new vectors don't fit its calibration
+    with collection_lock:
+        count = collection.count()
+    if count > BRUTE_FORCE_MAX_ITEMS:
+        # retrieve() uses HNSW at this size, so no uint8 copy is kept
+        if os.path.exists(QUANTIZED_INDEX_FILE):
+            os.remove(QUANTIZED_INDEX_FILE)
+        quantized_index = None
+        return
+    index = quantized_index
+    if index is not None and len(index.ids) + len(added_ids) == count:
+        if added_ids:
+            index = index.extended(added_ids, added_embs)
+    elif index is None and added_ids and len(added_ids) == count:
+        index = QuantizedIndex.build(added_ids, added_embs)
+    else:
+        index = None
+    if index is None and count:
+        print("🧮 Rebuilding the uint8 index from the collection...")
+        with collection_lock:
+            stored = collection.get(include=["embeddings"])
+        index = QuantizedIndex.build(stored["ids"], stored["embeddings"])
+    if index is not None and index is not quantized_index:
+        index.save()
+    quantized_index = index
+
+
+# Load the LLM into Ollama's memory ahead of the first question
+def warm_up_llm():
+    try:
+        SESSION.post("http://localhost:11434/api/generate", json={
+            "model": LLM_MODEL,
+            "prompt": "",
+            "keep_alive": LLM_KEEP_ALIVE
+        }, timeout=300)
+    except requests.exceptions.RequestException:
+        pass  # The first question reports any connection problem
 
 
 # GUI Application
@@ -112,8 +535,19 @@ class RAGEditorApp:
         
         self.status_label = tk.Label(root, text="Ready", bg="#f0f0f0", font=("Arial", 9), fg="#666")
         self.status_label.pack(anchor=tk.W, padx=10, pady=5)
+
+        # Tokens streamed by the worker thread, flushed by the Tk main loop
+        self._stream_buf = []
+        self._stream_lock = threading.Lock()
+        self._flush_job = None
+
+        threading.Thread(target=warm_up_llm, daemon=True).start()
     
     def ask_question(self):
+        # <Return> still fires while Ask is disabled; one question at a time
+        # keeps the streamed tokens and the flush loop to a single answer
+        if str(self.ask_btn["state"]) == tk.DISABLED:
+            return
         question = self.question_entry.get().strip()
         if not question:
             messagebox.showwarning("Warning", "Please enter a question!")
@@ -131,21 +565,31 @@ class RAGEditorApp:
     def _process_question(self, question):
         try:
             # Step 1: Embed the user question
-            self.status_label.config(text="Getting embedding...")
-            self.root.update()
+            self._set_status("Getting embedding...")
             q_emb = get_embedding(question)
 
-            # Step 2: Query the vector DB
-            results = collection.query(query_embeddings=[q_emb], n_results=3)
+            header = f"{'='*80}\n"
+            header += f"Question: {question}\n"
+            header += f"{'='*80}\n\n"
+
+            # Reuse the answer of a near-identical earlier question
+            cached = get_answer_cache().lookup(q_emb)
+            if cached is not None:
+                answer, similarity = cached
+                output = header
+                output += f"🤖 Answer (cached, similarity {similarity:.2f}):\n{'-'*80}\n"
+                output += answer
+                output += f"\n{'-'*80}\n\n"
 
-            # Step 3: Extract documents
-            top_docs = results['documents'][0]
-            top_ids = results['ids'][0]
+                self.root.after(0, self._append_output, output)
+                self.root.after(0, self._finish_question, "Ready (answer from cache)")
+                return
+
+            # Step 2-3: Query the vector DB (or scan the uint8 index) for the top documents
+            top_ids, top_docs = retrieve(q_emb)
 
             # Step 4: Build output with retrieved documents
-            output = f"{'='*80}\n"
-            output += f"Question: {question}\n"
-            output += f"{'='*80}\n\n"
+            output = header
             output += "🧠 Retrieved Documents:\n"
             output += f"{'-'*80}\n"
 
@@ -166,43 +610,96 @@ Context:
 Question: {question}
 Answer:"""
 
-            # Step 6: Generate answer with Ollama
-            self.status_label.config(text="Generating answer from LLM...")
-            self.root.update()
-            
-            response = requests.post("http://localhost:11434/api/generate", json={
+            # Step 6: Generate answer with Ollama, streaming tokens into the output
+            self._set_status("Generating answer from LLM...")
+
+            output += f"\n🤖 Answer:\n{'-'*80}\n"
+            self.root.after(0, self._append_output, output)
+
+            # Closing the response returns its connection to SESSION's pool,
+            # including after an error chunk or the early break on "done"
+            with SESSION.post("http://localhost:11434/api/generate", json={
                 "model": LLM_MODEL,
                 "prompt": prompt,
-                "stream": False
-            }, timeout=60)
-            response.raise_for_status()
-            answer = response.json()["response"].strip()
-            
-            output += f"\n🤖 Answer:\n{'-'*80}\n"
-            output += answer
-            output += f"\n{'-'*80}\n\n"
-            
-            # Update UI from main thread
-            self.output_text.insert(tk.END, output)
-            self.output_text.see(tk.END)
-            self.status_label.config(text="Ready")
-            self.question_entry.delete(0, tk.END)
-            self.ask_btn.config(state=tk.NORMAL)
-            
+                "stream": True,
+                "keep_alive": LLM_KEEP_ALIVE
+            }, timeout=60, stream=True) as response:
+                response.raise_for_status()
+
+                answer_parts = []
+                self.root.after(0, self._start_stream)
+                try:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = loads_json(line)
+                        if "error" in chunk:
+                            raise RuntimeError(chunk["error"])
+                        token = chunk.get("response", "")
+                        if not answer_parts:
+                            token = token.lstrip()
+                        if token:
+                            answer_parts.append(token)
+                            with self._stream_lock:
+                                self._stream_buf.append(token)
+                        if chunk.get("done"):
+                            break
+                finally:
+                    self.root.after(0, self._stop_stream)
+            answer = "".join(answer_parts).strip()
+            get_answer_cache().add(q_emb, answer)
+
+            self.root.after(0, self._append_output, f"\n{'-'*80}\n\n")
+            self.root.after(0, self._finish_question, "Ready")
+
         except requests.exceptions.ConnectionError:
             error_msg = "❌ Error: Cannot connect to Ollama at http://localhost:11434\n   Please ensure Ollama is running."
-            messagebox.showerror("Connection Error", error_msg)
-            self.status_label.config(text="Error - Connection failed")
-            self.ask_btn.config(state=tk.NORMAL)
+            self.root.after(0, self._fail_question, "Connection Error", error_msg, "Error - Connection failed")
         except requests.exceptions.Timeout:
-            messagebox.showerror("Timeout Error", "Request to Ollama timed out")
-            self.status_label.config(text="Error - Request timeout")
-            self.ask_btn.config(state=tk.NORMAL)
+            self.root.after(0, self._fail_question, "Timeout Error", "Request to Ollama timed out", "Error - Request timeout")
         except Exception as e:
-            messagebox.showerror("Error", f"Unexpected error: {e}")
-            self.status_label.config(text=f"Error - {str(e)}")
-            self.ask_btn.config(state=tk.NORMAL)
+            self.root.after(0, self._fail_question, "Error", f"Unexpected error: {e}", f"Error - {str(e)}")
     
+    # Worker-thread helpers: Tk widgets are only touched from the main loop
+    def _set_status(self, text):
+        self.root.after(0, lambda: self.status_label.config(text=text))
+
+    def _fail_question(self, title, message, status):
+        messagebox.showerror(title, message)
+        self.status_label.config(text=status)
+        self.ask_btn.config(state=tk.NORMAL)
+
+    def _append_output(self, text):
+        self.output_text.insert(tk.END, text)
+        self.output_text.see(tk.END)
+
+    # Buffered streaming: Tk relayouts on every insert, so tokens are
+    # written in one insert per STREAM_FLUSH_MS instead of one per token
+    def _start_stream(self):
+        self._flush_job = self.root.after(STREAM_FLUSH_MS, self._flush_stream)
+
+    def _flush_stream(self):
+        self._drain_stream()
+        self._flush_job = self.root.after(STREAM_FLUSH_MS, self._flush_stream)
+
+    def _stop_stream(self):
+        if self._flush_job is not None:
+            self.root.after_cancel(self._flush_job)
+            self._flush_job = None
+        self._drain_stream()
+
+    def _drain_stream(self):
+        with self._stream_lock:
+            text = "".join(self._stream_buf)
+            self._stream_buf.clear()
+        if text:
+            self._append_output(text)
+
+    def _finish_question(self, status):
+        self.status_label.config(text=status)
+        self.question_entry.delete(0, tk.END)
+        self.ask_btn.config(state=tk.NORMAL)
+
     def clear_output(self):
         self.output_text.delete(1.0, tk.END)
         self.status_label.config(text="Output cleared")
@@ -219,158 +716,30 @@ Answer:"""
             self.status_label.config(text=f"Saved to {file_path}")
 
 
-# Start GUI
-root = tk.Tk()
-app = RAGEditorApp(root)
-root.mainloop()
-
-# GUI Application
-class RAGEditorApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("RAG Editor - Ask Questions & Edit Answers")
-        self.root.geometry("900x700")
-        self.root.configure(bg="#f0f0f0")
-        
-        # Input frame
-        input_frame = tk.Frame(root, bg="#f0f0f0")
-        input_frame.pack(pady=10, padx=10, fill=tk.X)
-        
-        tk.Label(input_frame, text="Your Question:", bg="#f0f0f0", font=("Arial", 10, "bold")).pack(anchor=tk.W)
-        self.question_entry = tk.Entry(input_frame, font=("Arial", 11), width=80)
-        self.question_entry.pack(pady=5, fill=tk.X)
-        self.question_entry.bind("<Return>", lambda e: self.ask_question())
-        
-        # Button frame
-        button_frame = tk.Frame(root, bg="#f0f0f0")
-        button_frame.pack(pady=5, padx=10, fill=tk.X)
-        
-        self.ask_btn = tk.Button(button_frame, text="Ask", command=self.ask_question, bg="#4CAF50", fg="white", font=("Arial", 10, "bold"), width=10)
-        self.ask_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.save_btn = tk.Button(button_frame, text="Save Output", command=self.save_output, bg="#2196F3", fg="white", font=("Arial", 10, "bold"), width=10)
-        self.save_btn.pack(side=tk.LEFT, padx=5)
-        
-        self.clear_btn = tk.Button(button_frame, text="Clear", command=self.clear_output, bg="#f44336", fg="white", font=("Arial", 10, "bold"), width=10)
-        self.clear_btn.pack(side=tk.LEFT, padx=5)
-        
-        # Output frame
-        tk.Label(root, text="Output (Editable):", bg="#f0f0f0", font=("Arial", 10, "bold")).pack(anchor=tk.W, padx=10)
-        
-        self.output_text = scrolledtext.ScrolledText(root, font=("Courier", 10), height=25, bg="white", fg="#333")
-        self.output_text.pack(pady=5, padx=10, fill=tk.BOTH, expand=True)
-        
-        self.status_label = tk.Label(root, text="Ready", bg="#f0f0f0", font=("Arial", 9), fg="#666")
-        self.status_label.pack(anchor=tk.W, padx=10, pady=5)
-    
-    def ask_question(self):
-        question = self.question_entry.get().strip()
-        if not question:
-            messagebox.showwarning("Warning", "Please enter a question!")
-            return
-        
-        # Disable button during processing
-        self.ask_btn.config(state=tk.DISABLED)
-        self.status_label.config(text="Processing... retrieving documents and generating answer")
-        self.root.update()
-        
-        # Run in separate thread to avoid freezing UI
-        thread = threading.Thread(target=self._process_question, args=(question,))
-        thread.start()
-    
-    def _process_question(self, question):
-        try:
-            # Step 1: Embed the user question
-            self.status_label.config(text="Getting embedding...")
-            self.root.update()
-            q_emb = get_embedding(question)
-
-            # Step 2: Query the vector DB
-            results = collection.query(query_embeddings=[q_emb], n_results=3)
-
-            # Step 3: Extract documents
-            top_docs = results['documents'][0]
-            top_ids = results['ids'][0]
+def main():
+    parser = argparse.ArgumentParser(description="Ask questions over foods.json with ChromaDB + Ollama")
+    parser.add_argument("--no-ingest", action="store_true",
+                        help=f"don't add new items from {JSON_FILE} to ChromaDB on startup")
+    args = parser.parse_args()
 
-            # Step 4: Build output with retrieved documents
-            output = f"{'='*80}\n"
-            output += f"Question: {question}\n"
-            output += f"{'='*80}\n\n"
-            output += "🧠 Retrieved Documents:\n"
-            output += f"{'-'*80}\n"
+    # Force UTF-8 output on Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
 
-            for i, doc in enumerate(top_docs):
-                output += f"\n🔹 Source {i + 1} (ID: {top_ids[i]}):\n"
-                output += f"    {doc}\n"
+    load_quantized_index()
 
-            output += f"\n{'-'*80}\n"
-
-            # Step 5: Build prompt from context
-            context = "\n".join(top_docs)
+    # Ingest in the background so the window opens straight away
+    if not args.no_ingest:
+        threading.Thread(target=ingest).start()
 
-            prompt = f"""Use the following context to answer the question.
-
-Context:
-{context}
-
-Question: {question}
-Answer:"""
-
-            # Step 6: Generate answer with Ollama
-            self.status_label.config(text="Generating answer from LLM...")
-            self.root.update()
-            
-            response = requests.post("http://localhost:11434/api/generate", json={
-                "model": LLM_MODEL,
-                "prompt": prompt,
-                "stream": False
-            }, timeout=60)
-            response.raise_for_status()
-            answer = response.json()["response"].strip()
-            
-            output += f"\n🤖 Answer:\n{'-'*80}\n"
-            output += answer
-            output += f"\n{'-'*80}\n\n"
-            
-            # Update UI from main thread
-            self.output_text.insert(tk.END, output)
-            self.output_text.see(tk.END)
-            self.status_label.config(text="Ready")
-            self.question_entry.delete(0, tk.END)
-            self.ask_btn.config(state=tk.NORMAL)
-            
-        except requests.exceptions.ConnectionError:
-            error_msg = "❌ Error: Cannot connect to Ollama at http://localhost:11434\n   Please ensure Ollama is running."
-            messagebox.showerror("Connection Error", error_msg)
-            self.status_label.config(text="Error - Connection failed")
-            self.ask_btn.config(state=tk.NORMAL)
-        except requests.exceptions.Timeout:
-            messagebox.showerror("Timeout Error", "Request to Ollama timed out")
-            self.status_label.config(text="Error - Request timeout")
-            self.ask_btn.config(state=tk.NORMAL)
-        except Exception as e:
-            messagebox.showerror("Error", f"Unexpected error: {e}")
-            self.status_label.config(text=f"Error - {str(e)}")
-            self.ask_btn.config(state=tk.NORMAL)
-    
-    def clear_output(self):
-        self.output_text.delete(1.0, tk.END)
-        self.status_label.config(text="Output cleared")
-    
-    def save_output(self):
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
-        )
-        if file_path:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(self.output_text.get(1.0, tk.END))
-            messagebox.showinfo("Success", f"Output saved to {file_path}")
-            self.status_label.config(text=f"Saved to {file_path}")
+    # Start GUI
+    root = tk.Tk()
+    app = RAGEditorApp(root)
+    root.mainloop()
 
 
-# Start GUI
-root = tk.Tk()
-app = RAGEditorApp(root)
-root.mainloop()
+if __name__ == "__main__":
+    main()
 